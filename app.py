@@ -6,6 +6,7 @@ import os
 import logging
 import uvicorn
 import uuid
+from decimal import Decimal, InvalidOperation
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
@@ -17,27 +18,64 @@ from telegram.error import RetryAfter
 
 # Import your project modules
 from bot.handlers import setup_handlers # THE KEY CHANGE IS HERE
-from database_models.manager import Base, engine, AsyncSessionLocal, Game
+from bot.game_logic import WIN_CONDITIONS
+from database_models.manager import Base, engine, AsyncSessionLocal, Game, read_session, upgrade_schema
+from database_models.ledger import PRIZE_RATE, is_valid_stake, reserve_stake, refund_stakes, settle_finished_games
+from database_models.archive import archive_settled_games
 
 # --- Environment Variable Validation ---
 logger = logging.getLogger(__name__)
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional: point the bot at a different Bot API server (the load-test harness uses a local stub).
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
 
 if not TELEGRAM_BOT_TOKEN: raise ValueError("FATAL: TELEGRAM_BOT_TOKEN is not set.")
 if not WEBHOOK_URL: raise ValueError("FATAL: WEBHOOK_URL is not set.")
 if not DATABASE_URL: raise ValueError("FATAL: DATABASE_URL is not set.")
 
 PORT = int(os.getenv("PORT", "8000"))
+SETTLEMENT_INTERVAL = float(os.getenv("SETTLEMENT_INTERVAL", "5"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "60"))
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 
 # --- Database Initialization ---
 async def initialize_database():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
     logger.info("Database tables checked/initialized.")
 
+# --- Payout Settlement ---
+async def settle_games_periodically():
+    """
+    Pays out every finished game in one batch per tick. Settlement is idempotent,
+    so it's safe for each gunicorn worker to run this loop.
+    """
+    while True:
+        await asyncio.sleep(SETTLEMENT_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as session:
+                settled = await settle_finished_games(session)
+                await session.commit()
+            if settled:
+                logger.info(f"Settled payouts for {len(settled)} finished game(s).")
+        except Exception as e:
+            logger.error(f"Error settling finished games: {e}", exc_info=True)
+
+# --- Game Archival ---
+async def archive_games_periodically():
+    """Moves settled games out of the hot games table. Workers claim disjoint batches."""
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+        try:
+            archived = await archive_settled_games()
+            if archived:
+                logger.info(f"Archived {archived} settled game(s).")
+        except Exception as e:
+            logger.error(f"Error archiving settled games: {e}", exc_info=True)
+
 # --- FastAPI Lifespan Manager ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -45,11 +83,15 @@ async def lifespan(app: FastAPI):
     await initialize_database()
     
     # Setup Telegram Bot
-    bot_app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    bot_app = Application.builder().token(TELEGRAM_BOT_TOKEN).base_url(TELEGRAM_API_BASE_URL).build()
     
     # THE KEY CHANGE IS HERE: All handlers are now set up in a separate function
     setup_handlers(bot_app)
     
+    # Start processing updates: the webhook endpoint only puts them on bot_app.update_queue.
+    await bot_app.initialize()
+    await bot_app.start()
+    
     # Resilient Webhook Setup
     try:
         full_webhook_url = f"{WEBHOOK_URL}/api/telegram/webhook"
@@ -66,14 +108,20 @@ async def lifespan(app: FastAPI):
         logger.error(f"An unexpected error occurred during webhook setup: {e}", exc_info=True)
 
     app.state.bot_app = bot_app
+    settlement_task = asyncio.create_task(settle_games_periodically())
+    archive_task = asyncio.create_task(archive_games_periodically())
     
     yield # Application runs
     
     logger.info("Application shutting down...")
+    settlement_task.cancel()
+    archive_task.cancel()
     try:
         await app.state.bot_app.bot.delete_webhook()
     except Exception as e:
         logger.error(f"Error deleting webhook on shutdown: {e}")
+    await app.state.bot_app.stop()
+    await app.state.bot_app.shutdown()
 
 # --- Main Application Instance ---
 app = FastAPI(title="Yeab Game Zone", lifespan=lifespan)
@@ -90,6 +138,18 @@ class ConnectionManager:
         if user_id in self.active_connections: await self.active_connections[user_id].send_text(json.dumps(msg))
 manager = ConnectionManager()
 
+async def remove_waiting_games(user_id: int):
+    """Cancels the lobby games `user_id` created that nobody has joined, refunding their stakes."""
+    async with AsyncSessionLocal() as session:
+        stmt = select(Game.id).where(Game.creator_id == user_id, Game.status == 'waiting')
+        game_ids = (await session.execute(stmt)).scalars().all()
+        for game_id in game_ids:
+            # refund_stakes() re-checks the status as it deletes, so a game that was
+            # joined (or already cancelled) since the SELECT above is left alone.
+            if await refund_stakes(session, game_id, statuses=('waiting',)):
+                await session.commit()
+                await manager.broadcast({"event": "remove_game", "gameId": game_id})
+
 # --- Webhook Endpoint ---
 @app.post("/api/telegram/webhook")
 async def telegram_webhook(request: Request):
@@ -109,10 +169,10 @@ async def telegram_webhook(request: Request):
 async def websocket_endpoint(websocket: WebSocket, user_id: int):
     await manager.connect(websocket, user_id)
     try:
-        async with AsyncSessionLocal() as session:
+        async with read_session(user_id) as session:
             stmt = select(Game).where(Game.status == 'waiting').order_by(Game.id.desc())
             games = (await session.execute(stmt)).scalars().all()
-            game_list = [{"id": g.id, "creatorName": "Anonymous", "stake": float(g.stake), "win_condition": g.win_condition, "prize": float(g.stake) * 2 * 0.9} for g in games]
+            game_list = [{"id": g.id, "creatorName": "Anonymous", "stake": float(g.stake), "win_condition": g.win_condition, "prize": float(g.stake * 2 * PRIZE_RATE)} for g in games]
             await manager.send_personal_message({"event": "initial_game_list", "games": game_list}, user_id)
         while True:
             data = await websocket.receive_text()
@@ -120,24 +180,39 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
             event = message.get("event")
             if event == "create_game":
                 payload = message.get("payload", {})
-                stake, wc = payload.get("stake"), payload.get("winCondition")
+                try:
+                    stake = Decimal(str(payload.get("stake")))
+                except InvalidOperation:
+                    stake = Decimal(0)
+                wc = payload.get("winCondition")
+                if not is_valid_stake(stake):
+                    await manager.send_personal_message({"event": "create_game_failed", "reason": "invalid_stake"}, user_id)
+                    continue
+                if type(wc) is not int or wc not in WIN_CONDITIONS:
+                    await manager.send_personal_message({"event": "create_game_failed", "reason": "invalid_win_condition"}, user_id)
+                    continue
                 new_game = Game(id=str(uuid.uuid4()), creator_id=user_id, stake=stake, win_condition=wc, status='waiting')
                 async with AsyncSessionLocal() as session:
+                    # Escrow the stake and create the game in one transaction: both happen or neither does.
+                    if await reserve_stake(session, user_id, new_game.id, stake) is None:
+                        await session.rollback()
+                        await manager.send_personal_message({"event": "create_game_failed", "reason": "insufficient_balance"}, user_id)
+                        continue
                     session.add(new_game)
                     await session.commit()
-                game_data = {"id": new_game.id, "creatorName": "Anonymous", "stake": float(stake), "win_condition": wc, "prize": float(stake) * 2 * 0.9}
+                game_data = {"id": new_game.id, "creatorName": "Anonymous", "stake": float(stake), "win_condition": wc, "prize": float(stake * 2 * PRIZE_RATE)}
                 await manager.broadcast({"event": "new_game", "game": game_data})
     except WebSocketDisconnect:
         logger.info(f"Client {user_id} disconnected.")
-        async with AsyncSessionLocal() as session:
-            stmt = select(Game).where(Game.creator_id == user_id, Game.status == 'waiting')
-            games_to_remove = (await session.execute(stmt)).scalars().all()
-            for game in games_to_remove:
-                await session.delete(game)
-                await session.commit()
-                await manager.broadcast({"event": "remove_game", "gameId": game.id})
+    except Exception as e:
+        logger.error(f"WebSocket session for {user_id} ended with an error: {e}", exc_info=True)
     finally:
+        # However the session ended, don't leave games (and their escrowed stakes) behind.
         manager.disconnect(user_id)
+        try:
+            await remove_waiting_games(user_id)
+        except Exception as e:
+            logger.error(f"Error removing waiting games for {user_id}: {e}", exc_info=True)
 
 # --- Root Endpoint (No changes needed) ---
 @app.get("/")
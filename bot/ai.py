@@ -0,0 +1,312 @@
+# /bot/ai.py - Move suggestions and auto-play for LudoGame
+
+import math
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bot.game_logic import (LudoGame, HOME_YARD, HOME_STRETCH_START, HOME_POSITION,
+                            MAIN_PATH_LENGTH, START_POSITIONS)
+
+# --- Tuning ---
+DEFAULT_TIME_BUDGET = 0.002   # Seconds per decision. A batch of N decisions shares N times this.
+DEFAULT_SEARCH_DEPTH = 2      # Expectimax plies: our move, then every dice outcome for whoever moves next.
+DEFAULT_ROLLOUT_PLIES = 16    # Random plies per Monte Carlo rollout before the position is scored.
+DEFAULT_CACHE_SIZE = 100_000  # Evaluated positions remembered across decisions and tables.
+ROLLOUT_WEIGHT = 0.5          # Share of the final score that comes from the rollout average.
+
+DICE_FACES = (1, 2, 3, 4, 5, 6)
+
+
+# --- Position Helpers ---
+# The advisor works directly on LudoGame, trying moves with move_token() and then
+# putting every token back. These helpers take and restore that snapshot.
+def _snapshot(game: LudoGame) -> List[List[int]]:
+    return [list(game.players[player_id]['tokens']) for player_id in game.player_order]
+
+def _restore(game: LudoGame, snapshot: List[List[int]]):
+    for player_id, tokens in zip(game.player_order, snapshot):
+        game.players[player_id]['tokens'][:] = tokens
+
+def _position_key(game: LudoGame) -> Tuple[Tuple[int, ...], ...]:
+    return tuple(tuple(game.players[player_id]['tokens']) for player_id in game.player_order)
+
+def _progress(pos: int, player_index: int) -> int:
+    """Squares a token has covered: 0 in the yard, 1-51 on the main path, 52-58 in the home stretch."""
+    if pos == HOME_YARD:
+        return 0
+    if pos >= HOME_STRETCH_START:
+        return pos
+    return (pos - START_POSITIONS[player_index]) % MAIN_PATH_LENGTH + 1
+
+def _has_won(game: LudoGame, player_id: int) -> bool:
+    return game.players[player_id]['tokens'].count(HOME_POSITION) >= game.win_condition
+
+def evaluate(game: LudoGame, root_index: int) -> float:
+    """
+    Scores the position for player `root_index` (an index into player_order) between 0 and 1.
+    Only the `win_condition` most advanced tokens really matter, so the rest count for little.
+    """
+    win_condition = game.win_condition
+    scores = []
+    for index, player_id in enumerate(game.player_order):
+        data = game.players[player_id]
+        if data['tokens'].count(HOME_POSITION) >= win_condition:
+            return 1.0 if index == root_index else 0.0
+        progress = sorted((_progress(pos, data['player_index']) for pos in data['tokens']), reverse=True)
+        scores.append(sum(progress[:win_condition]) + 0.25 * sum(progress[win_condition:]))
+
+    best_opponent = max(score for index, score in enumerate(scores) if index != root_index)
+    advantage = scores[root_index] - best_opponent
+    return 1.0 / (1.0 + math.exp(-advantage / (15.0 * win_condition)))
+
+
+# --- The Advisor ---
+class MoveAdvisor:
+    """
+    Picks which token to move for the current dice roll.
+
+    Each candidate move is scored by a shallow expectimax over the following dice
+    outcomes (opponents are assumed to play against us), and the remaining time
+    budget is spent on Monte Carlo rollouts shared round-robin across every table
+    in the batch. Evaluated positions are cached across calls, so busy tables that
+    revisit common positions get cheaper over time.
+
+    The advisor never calls roll_dice() and always restores the tokens and dice roll
+    of the games it is given, so it is safe to call on live games between turns.
+    """
+
+    def __init__(self, time_budget: float = DEFAULT_TIME_BUDGET, search_depth: int = DEFAULT_SEARCH_DEPTH,
+                 rollout_plies: int = DEFAULT_ROLLOUT_PLIES, cache_size: int = DEFAULT_CACHE_SIZE,
+                 seed: Optional[int] = None):
+        self.time_budget = time_budget
+        self.search_depth = search_depth
+        self.rollout_plies = rollout_plies
+        self.cache_size = cache_size
+        self.rng = random.Random(seed)
+        self._cache: Dict[tuple, float] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # --- Public API ---
+    def choose_move(self, game: LudoGame, player_id: Optional[int] = None) -> Optional[int]:
+        """Returns the token index to move for the game's current dice roll, or None if nothing can move."""
+        return self.choose_moves([(game, player_id)])[0]
+
+    def choose_moves(self, decisions: Sequence[Tuple[LudoGame, Optional[int]]]) -> List[Optional[int]]:
+        """
+        Decides for many tables at once within len(decisions) * time_budget seconds.
+        Each decision is (game, player_id); a player_id of None means the current player.
+        """
+        start = time.perf_counter()
+        deadline = start + self.time_budget * len(decisions)
+        choices: List[Optional[int]] = [None] * len(decisions)
+        # (decision index, candidate) for every table with a real choice to make.
+        contested: List[Tuple[int, "_Candidate"]] = []
+        candidates_by_decision: Dict[int, List[_Candidate]] = {}
+
+        # Stage 1: expectimax, each decision capped at its own share of the budget.
+        for i, (game, player_id) in enumerate(decisions):
+            if player_id is None:
+                player_id = game.get_current_player_id()
+            movable = game.get_movable_tokens(player_id)
+            if len(movable) <= 1:
+                choices[i] = movable[0] if movable else None
+                continue
+            own_deadline = min(deadline, max(time.perf_counter(), start + self.time_budget * i) + self.time_budget)
+            candidates = self._score_candidates(game, player_id, movable, own_deadline)
+            if len(candidates) == 1:
+                choices[i] = candidates[0].token
+                continue
+            candidates_by_decision[i] = candidates
+            contested.extend((i, candidate) for candidate in candidates)
+
+        # Stage 2: rollouts, round-robin across all contested tables until the deadline.
+        while contested and time.perf_counter() < deadline:
+            for i, candidate in contested:
+                if time.perf_counter() >= deadline:
+                    break
+                candidate.add_rollout(self._rollout_after(decisions[i][0], candidate))
+
+        for i, candidates in candidates_by_decision.items():
+            choices[i] = max(candidates, key=lambda c: c.score()).token
+        return choices
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {"size": len(self._cache), "hits": self.cache_hits, "misses": self.cache_misses}
+
+    # --- Stage 1: Expectimax ---
+    def _score_candidates(self, game: LudoGame, player_id: int, movable: List[int],
+                          deadline: float) -> List["_Candidate"]:
+        order = game.player_order
+        root_index = order.index(player_id)
+        dice = game.dice_roll
+        next_index = root_index if dice == 6 else (root_index + 1) % len(order)
+        snapshot = _snapshot(game)
+        candidates: List[_Candidate] = []
+        seen = set()
+        try:
+            for token in movable:
+                game.dice_roll = dice
+                game.move_token(player_id, token)
+                key = _position_key(game)
+                if key not in seen:  # e.g. two yard tokens entering on a six
+                    seen.add(key)
+                    if _has_won(game, player_id):
+                        value = 1.0
+                    elif time.perf_counter() < deadline:
+                        value, _ = self._chance(game, root_index, next_index, self.search_depth - 1, deadline)
+                    else:
+                        value = evaluate(game, root_index)  # Out of time: greedy one-ply score.
+                    candidates.append(_Candidate(token, root_index, next_index, dice, snapshot, value))
+                _restore(game, snapshot)
+        finally:
+            _restore(game, snapshot)
+            game.dice_roll = dice
+        return candidates
+
+    def _chance(self, game: LudoGame, root_index: int, mover_index: int, depth: int,
+                deadline: float) -> Tuple[float, bool]:
+        """
+        Expected value for `root_index` when player `mover_index` is about to roll, and
+        whether it is complete. Past the deadline the search stops deepening and scores
+        positions as they stand; such a value, or any value built on one, is incomplete.
+        """
+        if depth <= 0:
+            return evaluate(game, root_index), True
+
+        key = (_position_key(game), game.win_condition, root_index, mover_index, depth)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached, True
+        self.cache_misses += 1
+
+        if time.perf_counter() >= deadline:
+            return evaluate(game, root_index), False
+        total, complete = 0.0, True
+        for dice in DICE_FACES:
+            value, reply_complete = self._best_reply(game, root_index, mover_index, dice, depth, deadline)
+            total += value
+            complete = complete and reply_complete
+        value = total / 6
+        # Only full-depth results go in the shared cache; a cut-off somewhere below
+        # would otherwise be reused by later decisions as if it were a real search.
+        if complete:
+            if len(self._cache) >= self.cache_size:
+                del self._cache[next(iter(self._cache))]  # Evict the oldest entry.
+            self._cache[key] = value
+        return value, complete
+
+    def _best_reply(self, game: LudoGame, root_index: int, mover_index: int, dice: int, depth: int,
+                    deadline: float) -> Tuple[float, bool]:
+        """
+        Value after `mover_index` plays `dice` as well as they can (badly for us, if they're
+        an opponent), and whether it is complete (see _chance()).
+        """
+        order = game.player_order
+        player_id = order[mover_index]
+        next_index = mover_index if dice == 6 else (mover_index + 1) % len(order)
+
+        game.dice_roll = dice
+        movable = game.get_movable_tokens(player_id)
+        if not movable:
+            return self._chance(game, root_index, next_index, depth - 1, deadline)
+
+        snapshot = _snapshot(game)
+        maximizing = mover_index == root_index
+        best, complete = None, True
+        for token in movable:
+            game.dice_roll = dice
+            game.move_token(player_id, token)
+            if _has_won(game, player_id):
+                value = 1.0 if maximizing else 0.0
+            else:
+                value, child_complete = self._chance(game, root_index, next_index, depth - 1, deadline)
+                complete = complete and child_complete
+            _restore(game, snapshot)
+            if best is None or (value > best if maximizing else value < best):
+                best = value
+        return best, complete
+
+    # --- Stage 2: Monte Carlo Rollouts ---
+    def _rollout_after(self, game: LudoGame, candidate: "_Candidate") -> float:
+        """Plays the candidate move, then random moves for rollout_plies plies, and scores the result."""
+        saved_dice = game.dice_roll
+        order = game.player_order
+        rng = self.rng
+        try:
+            _restore(game, candidate.root_snapshot)
+            game.dice_roll = candidate.dice
+            game.move_token(order[candidate.root_index], candidate.token)
+            mover_index = candidate.next_index
+            for _ in range(self.rollout_plies):
+                player_id = order[mover_index]
+                dice = int(rng.random() * 6) + 1
+                game.dice_roll = dice
+                movable = game.get_movable_tokens(player_id)
+                if movable:
+                    game.move_token(player_id, movable[0] if len(movable) == 1 else rng.choice(movable))
+                    if _has_won(game, player_id):
+                        return 1.0 if mover_index == candidate.root_index else 0.0
+                if dice != 6:
+                    mover_index = (mover_index + 1) % len(order)
+            return evaluate(game, candidate.root_index)
+        finally:
+            _restore(game, candidate.root_snapshot)
+            game.dice_roll = saved_dice
+
+
+class _Candidate:
+    """One legal move of one table, with its expectimax value and rollout tally."""
+    __slots__ = ("token", "root_index", "next_index", "dice", "root_snapshot", "value", "rollout_total", "rollouts")
+
+    def __init__(self, token: int, root_index: int, next_index: int, dice: int,
+                 root_snapshot: List[List[int]], value: float):
+        self.token = token
+        self.root_index = root_index
+        self.next_index = next_index
+        self.dice = dice
+        self.root_snapshot = root_snapshot
+        self.value = value
+        self.rollout_total = 0.0
+        self.rollouts = 0
+
+    def add_rollout(self, result: float):
+        self.rollout_total += result
+        self.rollouts += 1
+
+    def score(self) -> float:
+        if not self.rollouts:
+            return self.value
+        return (1 - ROLLOUT_WEIGHT) * self.value + ROLLOUT_WEIGHT * self.rollout_total / self.rollouts
+
+
+# --- Convenience Helpers ---
+_default_advisor: Optional[MoveAdvisor] = None
+
+def get_advisor() -> MoveAdvisor:
+    """The shared per-process advisor, so every table benefits from the same position cache."""
+    global _default_advisor
+    if _default_advisor is None:
+        _default_advisor = MoveAdvisor()
+    return _default_advisor
+
+def suggest_move(game: LudoGame, player_id: Optional[int] = None) -> Optional[int]:
+    """Suggests a token for the current dice roll, e.g. as the auto-move for an idle player."""
+    return get_advisor().choose_move(game, player_id)
+
+def auto_play_turn(game: LudoGame, advisor: Optional[MoveAdvisor] = None) -> Tuple[int, Optional[int], Optional[str]]:
+    """
+    Rolls for the current player and makes the advisor's move, as a bot opponent would.
+    Returns (dice roll, token moved, move_token result); the roll is -1 on a third six.
+    Advancing to the next player stays with the caller, as it does for human turns.
+    """
+    player_id = game.get_current_player_id()
+    roll = game.roll_dice()
+    if roll == -1:
+        return roll, None, None
+    token = (advisor or get_advisor()).choose_move(game, player_id)
+    if token is None:
+        return roll, None, None
+    return roll, token, game.move_token(player_id, token)
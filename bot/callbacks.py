@@ -1,10 +1,15 @@
 # /bot/callbacks.py (Final, Perfected Version)
 
 import logging
+import uuid
+from decimal import Decimal
 from telegram import (Update, ReplyKeyboardMarkup, KeyboardButton,
                         InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo)
 from telegram.ext import ContextTypes, ConversationHandler
 
+from database_models.manager import AsyncSessionLocal, Game
+from database_models.ledger import reserve_stake
+
 # --- 1. Setup & Configuration ---
 logger = logging.getLogger(__name__)
 
@@ -117,11 +122,24 @@ async def receive_win_condition_and_create_game(update: Update, context: Context
 
     logger.info(f"User {user.id} chose win condition: {win_condition}. Creating game lobby.")
 
-    # --- TODO: Database Logic Goes Here ---
-    # 1. Check user's balance. If insufficient, send error and cancel.
-    # 2. Create a new game record in the 'games' table with status 'lobby'.
-    # 3. Get the unique game_id from the newly created record.
-    game_id = 123  # Using a placeholder for now
+    if not isinstance(stake, int):
+        await query.edit_message_text("Something went wrong. Please tap 'Play' to start again.")
+        return ConversationHandler.END
+
+    # Escrow the stake and create the game in one transaction. The balance check is
+    # part of the escrow UPDATE itself, so two concurrent games can't overdraw it.
+    game_id = str(uuid.uuid4())
+    async with AsyncSessionLocal() as session:
+        if await reserve_stake(session, user.id, game_id, Decimal(stake)) is None:
+            await session.rollback()
+            await query.edit_message_text(
+                f"❌ Insufficient balance. You need at least {stake} ETB to create this game.\n"
+                "Please deposit and try again."
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
+        session.add(Game(id=game_id, creator_id=user.id, stake=stake, win_condition=win_condition, status='waiting'))
+        await session.commit()
 
     join_button = [[InlineKeyboardButton("Join Game", callback_data=f"join_{game_id}")]]
     inline_markup = InlineKeyboardMarkup(join_button)
@@ -130,4 +148,11 @@ async def receive_win_condition_and_create_game(update: Update, context: Context
         f"📣 **Game Lobby Created!**\n\n"
         f"👤 **Creator:** {user.first_name}\n"
         f"💰 **Stake:** {stake} ETB\n"
-  
\ No newline at end of file
+        f"🏆 **Win Condition:** {win_condition} token(s) home\n\n"
+        "Waiting for an opponent to join..."
+    )
+
+    await query.edit_message_text(text=lobby_message, reply_markup=inline_markup, parse_mode='Markdown')
+
+    context.user_data.clear()
+    return ConversationHandler.END
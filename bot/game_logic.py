@@ -6,6 +6,7 @@ from typing import Dict, List, Any
 # --- Constants for Board Layout ---
 # Using constants makes the code cleaner and easier to modify.
 HOME_YARD = -1  # Represents a token in the home yard (not on the board)
+MAIN_PATH_LENGTH = 52 # Squares on the shared main path (0-51)
 HOME_STRETCH_START = 52 # The first position in any home stretch
 HOME_POSITION = 58 # The final position indicating a token is home and cannot move
 
@@ -17,6 +18,9 @@ HOME_ENTRY_POSITIONS = [50, 11, 24, 37]
 # Safe zones on the main board path
 SAFE_ZONES = [0, 8, 13, 21, 26, 34, 39, 47]
 
+# Tokens a player must bring home to win; the only choices offered when creating a game
+WIN_CONDITIONS = (1, 2, 4)
+
 
 class LudoGame:
     """
@@ -126,4 +130,30 @@ class LudoGame:
         if current_pos >= HOME_STRETCH_START:
             new_pos = current_pos + self.dice_roll
             player_data['tokens'][token_index] = new_pos
-            if new_po
\ No newline at end of file
+            if new_pos == HOME_POSITION:
+                return "home"
+            return "moved"
+
+        # --- Rule 4: Moving along the main path ---
+        new_pos = (current_pos + self.dice_roll) % MAIN_PATH_LENGTH
+        captured = self._knock_out_opponents_at(new_pos, player_id)
+        player_data['tokens'][token_index] = new_pos
+        return "captured" if captured else "moved"
+
+    def _knock_out_opponents_at(self, position: int, player_id: int) -> bool:
+        """
+        Sends every opponent token on `position` back to its yard, unless the square is safe.
+        Returns True if anything was knocked out.
+        """
+        if position in SAFE_ZONES:
+            return False
+
+        captured = False
+        for other_id, other_data in self.players.items():
+            if other_id == player_id:
+                continue
+            for i, pos in enumerate(other_data['tokens']):
+                if pos == position:
+                    other_data['tokens'][i] = HOME_YARD
+                    captured = True
+        return captured
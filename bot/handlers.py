@@ -11,7 +11,7 @@ from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
 
 # Import database session and models
-from database_models.manager import AsyncSessionLocal, User, Transaction
+from database_models.manager import AsyncSessionLocal, User, Transaction, read_session
 
 # --- Environment Variable Validation ---
 # We ONLY check for variables that are needed immediately at import time.
@@ -19,7 +19,9 @@ from database_models.manager import AsyncSessionLocal, User, Transaction
 CHAPA_API_KEY = os.getenv("CHAPA_API_KEY")
 if not CHAPA_API_KEY: raise ValueError("FATAL: CHAPA_API_KEY is not set.")
 
-CHAPA_API_URL = "https://api.chapa.co/v1/transaction/initialize"
+# Overridable so the load-test harness can swap in its local Chapa stub.
+CHAPA_API_BASE_URL = os.getenv("CHAPA_API_BASE_URL", "https://api.chapa.co/v1")
+CHAPA_API_URL = f"{CHAPA_API_BASE_URL}/transaction/initialize"
 
 # --- Conversation States & Logging ---
 DEPOSIT_AMOUNT = range(1)
@@ -27,12 +29,13 @@ logger = logging.getLogger(__name__)
 
 # --- Helper Functions ---
 async def get_or_create_user(user_id: int, username: str) -> User:
-    # This robust version handles race conditions correctly
+    # This robust version handles race conditions correctly.
+    # The lookup can be served by the read replica; creating the user can't.
+    stmt = select(User).where(User.telegram_id == user_id)
+    async with read_session(user_id) as session:
+        user = (await session.execute(stmt)).scalar_one_or_none()
+    if user: return user
     async with AsyncSessionLocal() as session:
-        stmt = select(User).where(User.telegram_id == user_id)
-        result = await session.execute(stmt)
-        user = result.scalar_one_or_none()
-        if user: return user
         try:
             logger.info(f"Creating new user for ID: {user_id}")
             new_user = User(telegram_id=user_id, username=username, balance=0.00)
@@ -83,7 +86,7 @@ async def main_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = query.from_user.id
 
     if action == "wallet":
-        async with AsyncSessionLocal() as session:
+        async with read_session(user_id) as session:
             user = await session.get(User, user_id)
         balance = user.balance if user else 0.00
         wallet_text = f"💰 **Your Wallet**\n\n**Current Balance:** `{balance:.2f} ETB`"
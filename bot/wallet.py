@@ -7,7 +7,7 @@ from decimal import Decimal
 
 # --- Chapa Configuration ---
 CHAPA_API_KEY = os.getenv("CHAPA_API_KEY")
-CHAPA_API_URL = "https://api.chapa.co/v1"
+CHAPA_API_URL = os.getenv("CHAPA_API_BASE_URL", "https://api.chapa.co/v1")
 
 # --- Placeholder OTP Service ---
 # In a real application, you would use a real SMS provider API here.
@@ -0,0 +1,185 @@
+# database_models/archive.py - Moving settled games out of the hot `games` table
+#
+# Once a game is settled (its payout is in the ledger), nothing on the live path
+# reads it again. archive_settled_games() copies such games into the append-only
+# `game_archive` table in a compact form and deletes them from `games`, so the hot
+# table only holds lobby and in-progress games. History and analytics read the
+# archive back through streaming generators on the read replica, so reporting
+# never competes with live play on the primary.
+#
+# Move log format: game_state["moves"] is a list of [player_index, dice, token],
+# where token is None when the roll had no legal move. A third six in a row is
+# logged as dice LOST_TURN with no token. Use record_move() to append.
+#
+# A settled game whose move log can't be encoded isn't allowed to hold up the
+# rest of its batch: it is moved to ARCHIVE_FAILED_STATUS and left for a human.
+
+import json
+import logging
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_, select, update
+
+from database_models.manager import AsyncSessionLocal, Game, GameArchive, read_session
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+MOVES_KEY = "moves"
+NO_MOVE = 4  # Token value stored for a roll with nothing to move.
+LOST_TURN = -1  # Dice value for a third six in a row; LudoGame.roll_dice() returns the same.
+_LOST_TURN_BITS = 6  # Dice bits store dice - 1 (0-5), so 6 is free to mean a lost turn.
+ARCHIVABLE_STATUS = "settled"
+ARCHIVE_FAILED_STATUS = "archive_failed"
+
+
+# --- Move Log Encoding ---
+def _check_move(player_index: int, dice: int, token: Optional[int]):
+    """Raises ValueError unless the move fits the one-byte encoding."""
+    if type(player_index) is not int or not 0 <= player_index <= 3:
+        raise ValueError(f"player_index must be 0-3, got {player_index!r}")
+    if dice == LOST_TURN and type(dice) is int:
+        if token is not None:
+            raise ValueError(f"A lost turn moves no token, got token {token!r}")
+        return
+    if type(dice) is not int or not 1 <= dice <= 6:
+        raise ValueError(f"dice must be 1-6 or LOST_TURN, got {dice!r}")
+    if token is not None and (type(token) is not int or not 0 <= token <= 3):
+        raise ValueError(f"token must be 0-3 or None, got {token!r}")
+
+def record_move(game_state: Dict[str, Any], player_index: int, dice: int, token: Optional[int]):
+    """Appends one move to a game_state's move log. Raises ValueError for a malformed move."""
+    _check_move(player_index, dice, token)
+    game_state.setdefault(MOVES_KEY, []).append([player_index, dice, token])
+
+def _encode_move(player_index: int, dice: int, token: Optional[int]) -> int:
+    _check_move(player_index, dice, token)
+    dice_bits = _LOST_TURN_BITS if dice == LOST_TURN else dice - 1
+    return (player_index << 6) | (dice_bits << 3) | (NO_MOVE if token is None else token)
+
+def encode_moves(moves: List[List[Optional[int]]]) -> bytes:
+    """
+    Packs each move into one byte: 2 bits of player index, 3 bits of (dice - 1)
+    (or 6 for LOST_TURN) and 3 bits of token index (NO_MOVE when nothing moved).
+    Raises ValueError if any move doesn't fit.
+    """
+    encoded = []
+    for move in moves:
+        if not isinstance(move, (list, tuple)) or len(move) != 3:
+            raise ValueError(f"A move is [player_index, dice, token], got {move!r}")
+        encoded.append(_encode_move(*move))
+    return bytes(encoded)
+
+def _decode_move(b: int) -> Tuple[int, int, Optional[int]]:
+    dice_bits, token = (b >> 3) & 0b111, b & 0b111
+    dice = LOST_TURN if dice_bits == _LOST_TURN_BITS else dice_bits + 1
+    return b >> 6, dice, None if token == NO_MOVE else token
+
+def decode_moves(packed: Optional[bytes]) -> List[Tuple[int, int, Optional[int]]]:
+    """The inverse of encode_moves(): a list of (player_index, dice, token or None)."""
+    if not packed:
+        return []
+    return [_decode_move(b) for b in packed]
+
+def compress_state(game_state: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    if game_state is None:
+        return None
+    return zlib.compress(json.dumps(game_state, separators=(",", ":")).encode(), 9)
+
+def decompress_state(blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    return json.loads(zlib.decompress(blob)) if blob else None
+
+def _archive_row(game: Game) -> Dict[str, Any]:
+    state = dict(game.game_state or {})
+    moves = state.pop(MOVES_KEY, [])
+    return {
+        "game_id": game.id,
+        "creator_id": game.creator_id,
+        "opponent_id": game.opponent_id,
+        "winner_id": game.winner_id,
+        "stake": game.stake,
+        "win_condition": game.win_condition,
+        "move_count": len(moves),
+        "moves": encode_moves(moves),
+        "final_state": compress_state(state or None),
+    }
+
+
+# --- The Archival Job ---
+async def archive_settled_games(batch_size: int = 500) -> int:
+    """
+    Archives every settled game, batch_size games per transaction.
+    Each batch copies the games into game_archive and deletes them from games in one
+    commit. Rows are claimed with FOR UPDATE SKIP LOCKED (ignored on SQLite), so several
+    workers can run this at once without stepping on each other. A game that can't be
+    encoded is moved to ARCHIVE_FAILED_STATUS in the same commit instead of failing the
+    batch. Returns the number archived.
+    """
+    archived = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            stmt = (select(Game).where(Game.status == ARCHIVABLE_STATUS).limit(batch_size)
+                    .with_for_update(skip_locked=True))
+            games = (await session.execute(stmt)).scalars().all()
+            if not games:
+                return archived
+            rows, failed_ids = [], []
+            for game in games:
+                try:
+                    rows.append(_archive_row(game))
+                except (ValueError, TypeError) as e:
+                    logger.error(f"Can't archive game {game.id}, marking it '{ARCHIVE_FAILED_STATUS}': {e}")
+                    failed_ids.append(game.id)
+            if rows:
+                await session.execute(insert(GameArchive), rows)
+                await session.execute(delete(Game).where(Game.id.in_([row["game_id"] for row in rows])))
+            if failed_ids:
+                await session.execute(update(Game).where(Game.id.in_(failed_ids)).values(status=ARCHIVE_FAILED_STATUS))
+            await session.commit()
+        archived += len(rows)
+        if len(games) < batch_size:
+            return archived
+
+
+# --- Streaming Readers ---
+def _summary(row: GameArchive, include_moves: bool) -> Dict[str, Any]:
+    summary = {
+        "game_id": row.game_id,
+        "creator_id": row.creator_id,
+        "opponent_id": row.opponent_id,
+        "winner_id": row.winner_id,
+        "stake": row.stake,
+        "win_condition": row.win_condition,
+        "move_count": row.move_count,
+        "archived_at": row.archived_at,
+    }
+    if include_moves:
+        summary["moves"] = decode_moves(row.moves)
+        summary["final_state"] = decompress_state(row.final_state)
+    return summary
+
+async def _stream(stmt, include_moves: bool, batch_size: int) -> AsyncIterator[Dict[str, Any]]:
+    # Without the move log only the summary columns are fetched, so the blobs never leave the database.
+    if not include_moves:
+        stmt = stmt.with_only_columns(*[getattr(GameArchive, c) for c in (
+            "game_id", "creator_id", "opponent_id", "winner_id", "stake", "win_condition", "move_count", "archived_at")])
+    async with read_session() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for row in (result.scalars() if include_moves else result):
+            yield _summary(row, include_moves)
+
+def iter_player_history(user_id: int, include_moves: bool = False,
+                        batch_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+    """Streams a player's archived games, newest first, batch_size rows at a time."""
+    stmt = (select(GameArchive)
+            .where(or_(GameArchive.creator_id == user_id, GameArchive.opponent_id == user_id))
+            .order_by(GameArchive.archived_at.desc(), GameArchive.game_id))
+    return _stream(stmt, include_moves, batch_size)
+
+def iter_archive(since=None, include_moves: bool = False, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """Streams the whole archive (optionally only rows archived at or after `since`) for analytics."""
+    stmt = select(GameArchive).order_by(GameArchive.archived_at, GameArchive.game_id)
+    if since is not None:
+        stmt = stmt.where(GameArchive.archived_at >= since)
+    return _stream(stmt, include_moves, batch_size)
@@ -0,0 +1,214 @@
+# database_models/ledger.py - Stake escrow and the append-only balance ledger
+#
+# Every balance change is a single conditional statement against `users`, paired
+# with a row in `transactions` written in the same statement (Postgres) or the
+# same transaction (other databases). Ledger rows are only ever inserted, never
+# updated, and their tx_ref is deterministic per (game, user), so a retried or
+# duplicated refund/payout hits the primary key and becomes a no-op instead of
+# paying twice. Nothing here reads a balance and then writes it back, so there is
+# no window for two workers to race and no SELECT ... FOR UPDATE lock convoy.
+#
+# Amounts in the ledger are signed: stakes are negative, refunds and payouts positive.
+#
+# A game's escrow ends exactly one way. refund_stakes() first claims the game by
+# deleting it while it is still 'waiting' or 'active'. finish_game() only moves an
+# 'active' game to 'finished'. Both are guarded writes on the same row, so once one
+# wins the other finds nothing to do. Settlement also skips any game with refund rows.
+
+from decimal import Decimal
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import DECIMAL, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database_models.manager import mark_user_write
+
+# --- Constants ---
+PRIZE_RATE = Decimal("0.9")  # The winner takes 90% of the pot; the rest is the house fee.
+MAX_STAKE = Decimal("10000")  # Keeps stakes and pots well inside numeric(10, 2).
+CENT = Decimal("0.01")
+
+_MONEY = DECIMAL(10, 2)
+
+
+def _uses_data_modifying_ctes(session: AsyncSession) -> bool:
+    """Postgres can chain INSERT/UPDATE inside one WITH statement; SQLite and friends can't."""
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def is_valid_stake(stake: Decimal) -> bool:
+    """A stake must be a whole number of cents between 0.01 and MAX_STAKE."""
+    return stake.is_finite() and 0 < stake <= MAX_STAKE and stake == stake.quantize(CENT)
+
+
+# --- Escrow ---
+_DEBIT_SQL = """
+    UPDATE users SET balance = balance - :stake
+    WHERE telegram_id = :user_id AND balance >= :stake
+    RETURNING telegram_id, balance
+"""
+
+_RESERVE_SQL_POSTGRES = f"""
+    WITH debit AS ({_DEBIT_SQL}),
+    entry AS (
+        INSERT INTO transactions (tx_ref, user_id, amount, type, status, game_id)
+        SELECT CAST(:tx_ref AS TEXT), telegram_id, -CAST(:stake AS NUMERIC), 'stake', 'completed',
+               CAST(:game_id AS VARCHAR)
+        FROM debit
+    )
+    SELECT balance FROM debit
+"""
+
+_STAKE_ENTRY_SQL = """
+    INSERT INTO transactions (tx_ref, user_id, amount, type, status, game_id)
+    VALUES (:tx_ref, :user_id, -:stake, 'stake', 'completed', :game_id)
+"""
+
+
+async def reserve_stake(session: AsyncSession, user_id: int, game_id: str, stake: Decimal) -> Optional[Decimal]:
+    """
+    Moves `stake` from the user's balance into escrow for `game_id`.
+    Returns the new balance, or None if the balance was too low (nothing is written).
+    Runs inside the caller's transaction; the caller commits together with the game row.
+    """
+    if not is_valid_stake(stake):
+        raise ValueError(f"Stake must be a whole number of cents between {CENT} and {MAX_STAKE}, got {stake}")
+
+    params = {"stake": bindparam("stake", stake, type_=_MONEY), "user_id": bindparam("user_id", user_id),
+              "game_id": bindparam("game_id", game_id), "tx_ref": bindparam("tx_ref", f"YGZ-STK-{game_id}-{user_id}")}
+
+    mark_user_write(session, user_id)
+    if _uses_data_modifying_ctes(session):
+        # One round-trip: the debit and its ledger row succeed or fail together.
+        row = (await session.execute(text(_RESERVE_SQL_POSTGRES).bindparams(*params.values()))).first()
+        return row.balance if row else None
+
+    row = (await session.execute(text(_DEBIT_SQL).bindparams(params["stake"], params["user_id"]))).first()
+    if row is None:
+        return None
+    await session.execute(text(_STAKE_ENTRY_SQL).bindparams(*params.values()))
+    return row.balance
+
+
+# --- Crediting (refunds and payouts) ---
+# Both follow the same shape: an INSERT ... SELECT of ledger rows that RETURNs what
+# it actually inserted, followed by crediting exactly those amounts to the users.
+_CREDIT_SQL_POSTGRES = """
+    WITH entry AS ({insert_sql}),
+    credited AS (
+        UPDATE users SET balance = users.balance + credit.total
+        FROM (SELECT user_id, SUM(amount) AS total FROM entry GROUP BY user_id) AS credit
+        WHERE users.telegram_id = credit.user_id
+    )
+    SELECT user_id, game_id FROM entry
+"""
+
+
+async def _insert_entries_and_credit(session: AsyncSession, insert_sql: str, params: list) -> List[str]:
+    """
+    Runs a ledger `INSERT ... RETURNING user_id, amount, game_id` and credits the
+    inserted amounts to their users. Returns the ids of the games that were touched.
+    """
+    if _uses_data_modifying_ctes(session):
+        stmt = text(_CREDIT_SQL_POSTGRES.format(insert_sql=insert_sql)).bindparams(*params)
+        entries = (await session.execute(stmt)).all()
+    else:
+        entries = (await session.execute(text(insert_sql).bindparams(*params))).all()
+        credits = {}
+        for entry in entries:
+            credits[entry.user_id] = credits.get(entry.user_id, Decimal("0")) + Decimal(str(entry.amount))
+        if credits:
+            await session.execute(
+                text("UPDATE users SET balance = balance + :amount WHERE telegram_id = :user_id").bindparams(
+                    bindparam("amount", type_=_MONEY)),
+                [{"amount": amount, "user_id": user_id} for user_id, amount in credits.items()],
+            )
+
+    for user_id in {entry.user_id for entry in entries}:
+        mark_user_write(session, user_id)
+    return sorted({entry.game_id for entry in entries})
+
+
+_CANCELLABLE_STATUSES = ("waiting", "active")
+
+
+async def refund_stakes(session: AsyncSession, game_id: str,
+                        statuses: Sequence[str] = _CANCELLABLE_STATUSES) -> bool:
+    """
+    Cancels `game_id` and returns every escrowed stake to its owner, in the caller's transaction.
+    The game row is deleted only while its status is still one of `statuses` (waiting or
+    active by default); a finished or settled game, or one another worker already cancelled,
+    is left alone and nothing is refunded. Returns True if this call cancelled the game.
+    """
+    if not set(statuses) <= set(_CANCELLABLE_STATUSES):
+        raise ValueError(f"Only {_CANCELLABLE_STATUSES} games can be refunded, got {statuses}")
+    claimed = await session.execute(
+        text("DELETE FROM games WHERE id = :game_id AND status IN :statuses RETURNING creator_id, opponent_id")
+        .bindparams(bindparam("statuses", list(statuses), expanding=True)),
+        {"game_id": game_id},
+    )
+    game = claimed.first()
+    if game is None:
+        return False
+    for user_id in (game.creator_id, game.opponent_id):
+        if user_id is not None:
+            mark_user_write(session, user_id)
+
+    insert_sql = """
+        INSERT INTO transactions (tx_ref, user_id, amount, type, status, game_id)
+        SELECT 'YGZ-REF-' || game_id || '-' || user_id, user_id, -amount, 'refund', 'completed', game_id
+        FROM transactions WHERE game_id = :game_id AND type = 'stake'
+        ON CONFLICT (tx_ref) DO NOTHING
+        RETURNING user_id, amount, game_id
+    """
+    await _insert_entries_and_credit(session, insert_sql, [bindparam("game_id", game_id)])
+    return True
+
+
+# --- Finishing & Settling Games ---
+async def finish_game(session: AsyncSession, game_id: str, winner_id: int) -> bool:
+    """
+    Records the winner of an active game. The payout itself happens in the next
+    settle_finished_games() batch. Returns False if the game wasn't active.
+    """
+    result = await session.execute(
+        text("UPDATE games SET status = 'finished', winner_id = :winner_id WHERE id = :game_id AND status = 'active'"),
+        {"winner_id": winner_id, "game_id": game_id},
+    )
+    return result.rowcount == 1
+
+
+async def settle_finished_games(session: AsyncSession, game_ids: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Pays every finished game's winner PRIZE_RATE of the escrowed pot in one batch and
+    marks those games 'settled'. Pass `game_ids` to settle only those games.
+    Idempotent: a game that has already been paid out is skipped. Returns the settled game ids.
+    """
+    only_these = ""
+    params = [bindparam("prize_rate", PRIZE_RATE, type_=_MONEY)]
+    if game_ids is not None:
+        game_ids = list(game_ids)
+        if not game_ids:
+            return []
+        only_these = "AND g.id IN :game_ids"
+        params.append(bindparam("game_ids", game_ids, expanding=True))
+
+    insert_sql = f"""
+        INSERT INTO transactions (tx_ref, user_id, amount, type, status, game_id)
+        SELECT 'YGZ-WIN-' || g.id, g.winner_id, ROUND(-SUM(s.amount) * :prize_rate, 2), 'payout', 'completed', g.id
+        FROM games g JOIN transactions s ON s.game_id = g.id AND s.type = 'stake'
+        WHERE g.status = 'finished' AND g.winner_id IS NOT NULL {only_these}
+          AND NOT EXISTS (SELECT 1 FROM transactions r WHERE r.game_id = g.id AND r.type = 'refund')
+        GROUP BY g.id, g.winner_id
+        ON CONFLICT (tx_ref) DO NOTHING
+        RETURNING user_id, amount, game_id
+    """
+    settled = await _insert_entries_and_credit(session, insert_sql, params)
+
+    if settled:
+        await session.execute(
+            text("UPDATE games SET status = 'settled' WHERE id IN :game_ids").bindparams(
+                bindparam("game_ids", expanding=True)),
+            {"game_ids": settled},
+        )
+    return settled
@@ -1,11 +1,18 @@
 # database_models/manager.py - The final and correct version with URL fix
 
+import logging
 import os
-from sqlalchemy import (Column, BigInteger, String, DECIMAL, JSON, Integer, Text)
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from sqlalchemy import (Column, BigInteger, String, DECIMAL, JSON, Integer, Text, DateTime, LargeBinary, Float, func,
+                        event, inspect, text)
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
 
 # 1. Get the standard database URL from the environment
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("FATAL ERROR: DATABASE_URL environment variable is not set.")
@@ -13,14 +20,53 @@ if not DATABASE_URL:
 # 2. THE BULLETPROOF FIX:
 # Manually ensure the driver is asyncpg.
 # The standard URL from Render is "postgresql://...". We replace it.
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+def _with_async_driver(url: str) -> str:
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+DATABASE_URL = _with_async_driver(DATABASE_URL)
 
 # 3. Create the engine with the corrected URL
 engine = create_async_engine(DATABASE_URL)
 
+# 4. Optional read replica with its own connection pool.
+# Read-only call sites (lobby listings, wallet views, user lookups) use read_session(),
+# which goes to the replica when DATABASE_READ_URL is set and to the primary otherwise.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+if DATABASE_READ_URL:
+    DATABASE_READ_URL = _with_async_driver(DATABASE_READ_URL)
+    read_engine = create_async_engine(
+        DATABASE_READ_URL,
+        pool_size=int(os.getenv("DATABASE_READ_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DATABASE_READ_MAX_OVERFLOW", "10")),
+    )
+else:
+    read_engine = engine
+
+# After a user's own commit, their reads stay on the primary this long (seconds) where
+# the replica's replay position can't be checked (non-Postgres replicas), and within the
+# committing worker. It should comfortably exceed the replica's lag.
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+class PrimarySession(Session):
+    """Session behind AsyncSessionLocal. Remembers which users each commit wrote for."""
+
+class PrimaryAsyncSession(AsyncSession):
+    """After each commit, publishes the positions of the users it wrote for to every worker."""
+
+    async def commit(self) -> None:
+        await super().commit()
+        user_ids = self.info.pop("committed_user_ids", None)
+        if user_ids:
+            await _publish_write_positions(user_ids)
+
+class ReplicaSession(Session):
+    """Session behind read_session(). Refuses to flush, so writes can't land on a replica."""
+
 # --- The rest of the file remains the same ---
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+AsyncSessionLocal = sessionmaker(engine, class_=PrimaryAsyncSession, sync_session_class=PrimarySession, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(read_engine, class_=AsyncSession, sync_session_class=ReplicaSession, expire_on_commit=False)
 Base = declarative_base()
 
 class User(Base):
@@ -40,6 +86,7 @@ class Game(Base):
     game_state = Column(JSON, nullable=True)
     message_id = Column(BigInteger, nullable=True)
     chat_id = Column(BigInteger, nullable=True)
+    winner_id = Column(BigInteger, nullable=True)
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -47,4 +94,186 @@ class Transaction(Base):
     user_id = Column(BigInteger, nullable=False)
     amount = Column(DECIMAL(10, 2), nullable=False)
     type = Column(String, nullable=False)
-    status = Column(String, default="pending")
\ No newline at end of file
+    status = Column(String, default="pending")
+    # Ledger columns: stake/refund/payout entries (see ledger.py) point at their game.
+    game_id = Column(String, nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class GameArchive(Base):
+    # Settled games moved out of `games` by archive.py. Rows are only ever inserted.
+    # The summary columns stay queryable; the move log and final board are compacted.
+    __tablename__ = "game_archive"
+    game_id = Column(String, primary_key=True)
+    creator_id = Column(BigInteger, nullable=False, index=True)
+    opponent_id = Column(BigInteger, nullable=True, index=True)
+    winner_id = Column(BigInteger, nullable=True)
+    stake = Column(DECIMAL(10, 2), nullable=False)
+    win_condition = Column(Integer, nullable=False)
+    move_count = Column(Integer, nullable=False, default=0)
+    moves = Column(LargeBinary, nullable=True)        # One byte per move, see archive.encode_moves()
+    final_state = Column(LargeBinary, nullable=True)  # zlib-compressed JSON of the last game_state
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class WritePosition(Base):
+    # Where each user's latest commit ended, shared by all workers so read_session()
+    # can tell whether the replica has caught up with that user (see Read/Write Routing).
+    __tablename__ = "write_positions"
+    user_id = Column(BigInteger, primary_key=True)
+    wal_lsn = Column(BigInteger, nullable=True)  # pg_current_wal_lsn() after the commit; NULL off Postgres
+    written_at = Column(Float, nullable=False)   # time.time() after the commit
+
+
+# --- Schema Upgrades ---
+# create_all() only creates missing tables; it never adds columns to a table that
+# already exists. Columns added after the first deploy are listed here, and
+# upgrade_schema() adds them (and their indexes) to older databases.
+_ADDED_COLUMNS = [
+    # (table, column, SQL type, SQL default or None)
+    ("games", "winner_id", "BIGINT", None),
+    ("transactions", "game_id", "VARCHAR", None),
+    ("transactions", "created_at", "TIMESTAMP WITH TIME ZONE", "CURRENT_TIMESTAMP"),
+]
+_ADDED_INDEXES = [("ix_transactions_game_id", "transactions", "game_id")]
+
+def upgrade_schema(sync_conn):
+    """
+    Brings tables created by an older version up to date. Idempotent; run it right
+    after create_all(), e.g. `await conn.run_sync(upgrade_schema)`.
+    """
+    if sync_conn.dialect.name == "postgresql":
+        for table, column, sql_type, default in _ADDED_COLUMNS:
+            default_sql = f" DEFAULT {default}" if default else ""
+            sync_conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {sql_type}{default_sql}")
+    else:
+        # SQLite has no ADD COLUMN IF NOT EXISTS and can't add a column with a non-constant
+        # default, so on local databases upgraded rows get created_at = NULL.
+        inspector = inspect(sync_conn)
+        for table, column, sql_type, default in _ADDED_COLUMNS:
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                sync_conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}")
+    for name, table, column in _ADDED_INDEXES:
+        sync_conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+
+
+# --- Read/Write Routing ---
+# A user must always see their own writes, but their next request usually lands on
+# another gunicorn worker. So after a commit, PrimaryAsyncSession stamps each written
+# user's position in the shared write_positions table on the primary: the WAL position
+# on Postgres, the wall-clock time elsewhere. read_session(user_id) looks the stamp up
+# (one primary-key read on the primary) and only uses the replica once the replica's
+# replay position has passed it, or, without WAL positions, once READ_YOUR_WRITES_WINDOW
+# has elapsed. Reads without a user_id (listings, analytics) always use the replica.
+
+# user_id -> time.monotonic() until which this worker sends that user's reads to the
+# primary without looking up the shared stamp. Only an optimization for the worker that
+# made the write; the stamp is what makes it correct everywhere.
+_recent_writers: Dict[int, float] = {}
+
+# The highest WAL position the replica is known to have replayed; it only moves forward.
+_replica_replayed_lsn = 0
+
+# The columns that say whose data an ORM write touched.
+_WRITER_COLUMNS = {User: ("telegram_id",), Game: ("creator_id", "opponent_id"), Transaction: ("user_id",)}
+
+_LSN_SQL = "CAST({} - CAST('0/0' AS pg_lsn) AS BIGINT)"
+
+def mark_user_write(session, user_id: int):
+    """
+    Records that this session writes on behalf of `user_id`, for writes the ORM can't
+    see (e.g. raw UPDATE statements). Takes effect when the session commits.
+    """
+    session.info.setdefault("written_user_ids", set()).add(user_id)
+
+def wrote_recently(user_id: int) -> bool:
+    """True if this worker committed a write for `user_id` within READ_YOUR_WRITES_WINDOW."""
+    deadline = _recent_writers.get(user_id)
+    if deadline is None:
+        return False
+    if deadline < time.monotonic():
+        del _recent_writers[user_id]
+        return False
+    return True
+
+async def _publish_write_positions(user_ids):
+    if engine.dialect.name == "postgresql":
+        lsn = _LSN_SQL.format("pg_current_wal_lsn()")
+        on_conflict = "wal_lsn = GREATEST(write_positions.wal_lsn, EXCLUDED.wal_lsn), written_at = EXCLUDED.written_at"
+    else:
+        lsn, on_conflict = "NULL", "wal_lsn = NULL, written_at = EXCLUDED.written_at"
+    stmt = text(f"""
+        INSERT INTO write_positions (user_id, wal_lsn, written_at) VALUES (:user_id, {lsn}, :written_at)
+        ON CONFLICT (user_id) DO UPDATE SET {on_conflict}
+    """)
+    now = time.time()
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(stmt, [{"user_id": user_id, "written_at": now} for user_id in user_ids])
+    except Exception as e:
+        # The data is already committed; only other workers' replica routing is affected.
+        logger.error(f"Could not publish write positions for {sorted(user_ids)}: {e}")
+
+async def _replica_replayed(wal_lsn: int) -> bool:
+    global _replica_replayed_lsn
+    if _replica_replayed_lsn >= wal_lsn:
+        return True
+    async with read_engine.connect() as conn:
+        replayed = (await conn.execute(text(f"SELECT {_LSN_SQL.format('pg_last_wal_replay_lsn()')}"))).scalar()
+    if replayed is None:  # Not a streaming replica, so there is no position to compare.
+        return False
+    _replica_replayed_lsn = max(_replica_replayed_lsn, replayed)
+    return _replica_replayed_lsn >= wal_lsn
+
+async def replica_is_current_for(user_id: int) -> bool:
+    """True if the replica already reflects every commit made for `user_id`."""
+    if wrote_recently(user_id):
+        return False
+    async with engine.connect() as conn:
+        stamp = (await conn.execute(text("SELECT wal_lsn, written_at FROM write_positions WHERE user_id = :user_id"),
+                                    {"user_id": user_id})).first()
+    if stamp is None:
+        return True
+    if stamp.wal_lsn is not None and read_engine.dialect.name == "postgresql":
+        return await _replica_replayed(stamp.wal_lsn)
+    return time.time() - stamp.written_at > READ_YOUR_WRITES_WINDOW
+
+@asynccontextmanager
+async def read_session(user_id: Optional[int] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Yields a read-only session: on the replica normally, but on the primary while the
+    replica hasn't caught up with `user_id`'s own commits, so users always see their
+    own changes. Writes (games, transactions) use AsyncSessionLocal.
+    """
+    use_primary = read_engine is not engine and user_id is not None and not await replica_is_current_for(user_id)
+    async with (ReadSessionLocal(bind=engine) if use_primary else ReadSessionLocal()) as session:
+        yield session
+
+@event.listens_for(PrimarySession, "after_flush")
+def _collect_written_users(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for column in _WRITER_COLUMNS.get(type(obj), ()):
+            user_id = getattr(obj, column, None)
+            if user_id is not None:
+                mark_user_write(session, user_id)
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_written_users(session):
+    user_ids = session.info.pop("written_user_ids", None)
+    if not user_ids or read_engine is engine:
+        return
+    # PrimaryAsyncSession.commit() publishes these once the commit has returned.
+    session.info["committed_user_ids"] = user_ids
+    now = time.monotonic()
+    if len(_recent_writers) > 10000:
+        for user_id in [u for u, deadline in _recent_writers.items() if deadline < now]:
+            del _recent_writers[user_id]
+    for user_id in user_ids:
+        _recent_writers[user_id] = now + READ_YOUR_WRITES_WINDOW
+
+@event.listens_for(PrimarySession, "after_rollback")
+def _forget_written_users(session):
+    session.info.pop("written_user_ids", None)
+
+@event.listens_for(ReplicaSession, "before_flush")
+def _refuse_replica_writes(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise RuntimeError("read_session() is read-only; use AsyncSessionLocal for writes.")
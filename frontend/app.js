@@ -81,6 +81,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 case "initial_game_list": allGames = data.games; applyCurrentFilter(); break;
                 case "new_game": if (!allGames.some(g => g.id === data.game.id)) { allGames.unshift(data.game); } applyCurrentFilter(); break;
                 case "remove_game": allGames = allGames.filter(g => g.id !== data.gameId); removeGameCard(data.gameId); break;
+                case "create_game_failed": tg.showAlert(data.reason === "insufficient_balance" ? "Insufficient balance for this stake." : "Could not create the game."); break;
             }
         };
     }
@@ -0,0 +1,13 @@
+# loadtest/__init__.py - Local load-test harness for the lobby WebSocket and Telegram webhook
+#
+# Run it with:  python -m loadtest --help
+#
+# The harness starts local stub servers for the Telegram Bot API and Chapa,
+# boots app.py under gunicorn against SQLite (or a local Postgres), drives it
+# with synthetic WebSocket clients and Telegram updates, and prints a JSON
+# report with p50/p99 latency, throughput and memory per worker.
+#
+# Webhook latency only covers accepting an update onto bot_app.update_queue. The
+# report's webhook.sent / webhook.processed / webhook.processed_ratio say how many
+# of those updates the bot actually answered (counted on the Telegram stub), and
+# the gate's webhook.processed_ratio_min holds that to 99%.
@@ -0,0 +1,254 @@
+# loadtest/__main__.py - Command-line entry point for the load-test harness
+#
+# Example (5k lobby sockets plus 500 Telegram updates/sec for one minute):
+#   python -m loadtest --clients 5000 --ramp-up 20 --webhook-rate 500 --duration 60 \
+#       --output report.json --gate loadtest/gate.json
+#
+# The exit code is 1 when any threshold in the gate file is violated, so the
+# same command can run as a regression check before a deploy.
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from loadtest.clients import (FIRST_SYNTHETIC_USER_ID, PATTERNS, WEBHOOK_REPLY_METHODS, run_lobby_clients,
+                              run_webhook_sender)
+from loadtest.metrics import LatencyRecorder, MemorySampler, check_gate
+from loadtest.stubs import build_chapa_stub, build_telegram_stub, serve_stub
+
+# --- Setup & Configuration ---
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(REPO_ROOT, 'loadtest.db')}"
+LOADTEST_BOT_TOKEN = "123456789:LOADTEST"
+SYNTHETIC_BALANCE = 1_000_000  # Creating a game escrows the stake, so synthetic players need funds.
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Load-test harness for app.py.")
+    parser.add_argument("--clients", type=int, default=500, help="Number of synthetic WebSocket clients.")
+    parser.add_argument("--pattern", choices=PATTERNS, default="steady", help="How each client behaves.")
+    parser.add_argument("--games-per-client", type=int, default=1, help="Games each 'steady' client creates.")
+    parser.add_argument("--create-interval", type=float, default=1.0, help="Seconds between a client's creates.")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds over which clients connect.")
+    parser.add_argument("--webhook-rate", type=float, default=100.0, help="Telegram updates per second (0 disables).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load after start-up.")
+    parser.add_argument("--drain", type=float, default=10.0,
+                        help="Seconds to wait after the load for the bot to finish processing sent updates.")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn worker count (render.yaml uses 4).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--app-port", type=int, default=18000)
+    parser.add_argument("--telegram-port", type=int, default=18081)
+    parser.add_argument("--chapa-port", type=int, default=18082)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL,
+                        help="SQLite (default) or a local Postgres URL. Never point this at production.")
+    parser.add_argument("--read-database-url",
+                        help="Optional read replica for DATABASE_READ_URL. A second SQLite file starts as a copy of "
+                             "the seeded primary (but doesn't follow later writes); a Postgres URL must be a real "
+                             "streaming replica of --database-url, which receives the seed through replication.")
+    parser.add_argument("--fresh-db", action="store_true", help="Delete the default SQLite file before the run.")
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout.")
+    parser.add_argument("--gate", help="JSON file of thresholds; exit 1 if the report violates any of them.")
+    return parser.parse_args(argv)
+
+
+def raise_fd_limit():
+    """Thousands of sockets need more than the usual 1024 file descriptors."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def app_environment(args: argparse.Namespace) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_BOT_TOKEN": LOADTEST_BOT_TOKEN,
+        "TELEGRAM_API_BASE_URL": f"http://{args.host}:{args.telegram_port}/bot",
+        "CHAPA_API_KEY": "CHASECK_TEST-loadtest",
+        "CHAPA_API_BASE_URL": f"http://{args.host}:{args.chapa_port}/v1",
+        "WEBHOOK_URL": f"http://{args.host}:{args.app_port}",
+        "WEB_APP_URL": f"http://{args.host}:{args.app_port}",
+        "DATABASE_URL": args.database_url,
+    })
+    if args.read_database_url:
+        env["DATABASE_READ_URL"] = args.read_database_url
+    return env
+
+
+def _sqlite_path(url: str):
+    from sqlalchemy.engine import make_url
+    parsed = make_url(url)
+    return parsed.database if parsed.get_backend_name() == "sqlite" else None
+
+
+async def initialize_database(env: dict, clients: int):
+    """
+    Creates the tables once up-front so the workers don't race each other on start-up,
+    and (re)seeds the synthetic players with a funded balance. A SQLite stand-in
+    replica is replaced with a copy of the seeded primary so replica reads see the seed.
+    """
+    os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+    if "DATABASE_READ_URL" in env:
+        os.environ["DATABASE_READ_URL"] = env["DATABASE_READ_URL"]
+    from sqlalchemy import delete, insert
+    from database_models.manager import Base, User, engine, read_engine, upgrade_schema
+    last_user_id = FIRST_SYNTHETIC_USER_ID + max(clients, 1) - 1
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+        await conn.execute(delete(User).where(User.telegram_id.between(FIRST_SYNTHETIC_USER_ID, last_user_id)))
+        await conn.execute(insert(User), [
+            {"telegram_id": user_id, "username": f"load{user_id}", "balance": SYNTHETIC_BALANCE}
+            for user_id in range(FIRST_SYNTHETIC_USER_ID, last_user_id + 1)
+        ])
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+        primary_path, replica_path = _sqlite_path(env["DATABASE_URL"]), _sqlite_path(env["DATABASE_READ_URL"])
+        if primary_path and replica_path:
+            # A stand-in replica doesn't replicate: start it as a snapshot of the seeded primary.
+            shutil.copyfile(primary_path, replica_path)
+
+
+def start_app(args: argparse.Namespace, env: dict) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "-w", str(args.workers), "-k", "uvicorn.workers.UvicornWorker",
+        "--bind", f"{args.host}:{args.app_port}", "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+
+
+async def wait_until_ready(base_http_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"app exited during start-up with code {process.returncode}")
+            try:
+                if (await client.get(f"{base_http_url}/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"app did not become ready within {timeout:.0f}s")
+
+
+async def stop_app(process: subprocess.Popen):
+    # Wait off the event loop: the stubs still have to answer the app's shutdown calls.
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.to_thread(process.wait, 30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            await asyncio.to_thread(process.wait)
+
+
+def processed_updates(telegram_stub) -> int:
+    return sum(telegram_stub.state.calls.get(method, 0) for method in WEBHOOK_REPLY_METHODS)
+
+
+async def wait_for_processing(telegram_stub, sent: int, timeout: float):
+    """Gives the bot up to `timeout` seconds to reply to every update the webhook accepted."""
+    deadline = time.perf_counter() + timeout
+    while processed_updates(telegram_stub) < sent and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+
+
+def webhook_processing(sent: int, processed: int) -> dict:
+    return {"sent": sent, "processed": processed,
+            "processed_ratio": round(processed / sent, 4) if sent else 1.0}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    env = app_environment(args)
+    if args.fresh_db and args.database_url == DEFAULT_DATABASE_URL:
+        db_path = DEFAULT_DATABASE_URL.split(":///", 1)[1]
+        if os.path.exists(db_path):
+            os.remove(db_path)
+    await initialize_database(env, args.clients)
+
+    telegram_stub, chapa_stub = build_telegram_stub(), build_chapa_stub()
+    stub_servers = [
+        await serve_stub(telegram_stub, args.host, args.telegram_port),
+        await serve_stub(chapa_stub, args.host, args.chapa_port),
+    ]
+
+    base_http_url = f"http://{args.host}:{args.app_port}"
+    base_ws_url = f"ws://{args.host}:{args.app_port}"
+    process = start_app(args, env)
+    try:
+        await wait_until_ready(base_http_url, process)
+        sampler = MemorySampler(process.pid)
+        sampler.start()
+
+        recorders = {name: LatencyRecorder(name) for name in ("ws_connect", "ws_create", "webhook")}
+        counters = {"broadcasts_received": 0}
+        for recorder in recorders.values():
+            recorder.start()
+
+        load = []
+        if args.clients > 0:
+            load.append(run_lobby_clients(base_ws_url, args.clients, args.pattern, args.duration, args.ramp_up,
+                                          args.games_per_client, args.create_interval, recorders, counters))
+        if args.webhook_rate > 0:
+            load.append(run_webhook_sender(base_http_url, args.webhook_rate, args.duration, max(args.clients, 1),
+                                           recorders["webhook"]))
+        await asyncio.gather(*load)
+
+        for recorder in recorders.values():
+            recorder.stop()
+        webhooks_sent = len(recorders["webhook"].samples)
+        await wait_for_processing(telegram_stub, webhooks_sent, args.drain)
+        webhooks_processed = processed_updates(telegram_stub)
+        await sampler.stop()
+    finally:
+        await stop_app(process)
+        for server in stub_servers:
+            server.should_exit = True
+        await asyncio.gather(*(stub.state.serve_task for stub in (telegram_stub, chapa_stub)),
+                             return_exceptions=True)
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "gate")},
+        **{name: recorder.summary() for name, recorder in recorders.items()},
+        "webhook": {**recorders["webhook"].summary(), **webhook_processing(webhooks_sent, webhooks_processed)},
+        "broadcasts_received": counters["broadcasts_received"],
+        "memory": sampler.summary(),
+        "stub_calls": {"telegram": telegram_stub.state.calls},
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    raise_fd_limit()
+    report = asyncio.run(run(args))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.gate:
+        with open(args.gate) as f:
+            violations = check_gate(report, json.load(f))
+        for violation in violations:
+            print(f"GATE FAILED: {violation}", file=sys.stderr)
+        return 1 if violations else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# loadtest/clients.py - Synthetic WebSocket lobby clients and Telegram update senders
+
+import asyncio
+import itertools
+import json
+import random
+import time
+
+import httpx
+import websockets
+
+from loadtest.metrics import LatencyRecorder
+
+# --- Constants ---
+# Synthetic users live far away from real Telegram IDs so a shared database stays readable.
+FIRST_SYNTHETIC_USER_ID = 900_000_000
+BASE_STAKE = 20  # Client n stakes BASE_STAKE + n cents; see LobbyClient.
+WIN_CONDITIONS = [1, 2, 4]
+
+# Connection patterns a WebSocket client can follow:
+#   steady - connect once, create games at a fixed interval, stay until the end, disconnect
+#   churn  - connect, create one game, disconnect immediately, repeat until the end
+#   idle   - connect and only watch the lobby (receives every broadcast)
+PATTERNS = ("steady", "churn", "idle")
+
+# Every synthetic update makes the bot call exactly one of these Bot API methods once:
+# /start replies with sendMessage and a "wallet" tap is answered with answerCallbackQuery.
+# Counting them on the Telegram stub tells how many sent updates were actually processed.
+WEBHOOK_REPLY_METHODS = ("sendMessage", "answerCallbackQuery")
+
+
+class LobbyClient:
+    """One synthetic player connected to /ws/{user_id}."""
+
+    def __init__(self, base_ws_url: str, user_id: int, recorders: dict, counters: dict):
+        self.url = f"{base_ws_url}/ws/{user_id}"
+        self.user_id = user_id
+        self.recorders = recorders
+        self.counters = counters
+        # Every client stakes its own amount (BASE_STAKE plus one cent per client) and only
+        # varies the win condition, so it can recognise its own game in the "new_game"
+        # broadcast and time the round-trip.
+        self.stake = round(BASE_STAKE + (user_id - FIRST_SYNTHETIC_USER_ID) / 100, 2)
+        self.pending = {}
+
+    async def _receive(self, ws, connected_at: float):
+        async for raw in ws:
+            message = json.loads(raw)
+            event = message.get("event")
+            if event == "initial_game_list":
+                self.recorders["ws_connect"].record(time.perf_counter() - connected_at)
+            elif event == "new_game":
+                self.counters["broadcasts_received"] += 1
+                game = message.get("game", {})
+                key = (round(float(game.get("stake", 0)), 2), game.get("win_condition"))
+                sent_at = self.pending.pop(key, None)
+                if sent_at is not None:
+                    self.recorders["ws_create"].record(time.perf_counter() - sent_at)
+            elif event == "remove_game":
+                self.counters["broadcasts_received"] += 1
+
+    async def _create_game(self, ws):
+        # Only one outstanding create per (stake, win condition) can be timed.
+        free = [wc for wc in WIN_CONDITIONS if (self.stake, wc) not in self.pending]
+        if not free:
+            return
+        win_condition = random.choice(free)
+        self.pending[(self.stake, win_condition)] = time.perf_counter()
+        await ws.send(json.dumps({"event": "create_game", "payload": {"stake": self.stake, "winCondition": win_condition}}))
+
+    async def session(self, hold_until: float, games: int, create_interval: float):
+        """Connects once, creates `games` games, and stays connected until `hold_until`."""
+        started = time.perf_counter()
+        try:
+            async with websockets.connect(self.url, open_timeout=30, ping_interval=None, max_size=None) as ws:
+                receiver = asyncio.create_task(self._receive(ws, started))
+                try:
+                    for _ in range(games):
+                        await self._create_game(ws)
+                        await asyncio.sleep(create_interval)
+                    remaining = hold_until - time.perf_counter()
+                    if remaining > 0:
+                        await asyncio.sleep(remaining)
+                    else:
+                        # Give the last create a moment to come back before we drop the socket.
+                        await asyncio.sleep(min(create_interval, 1.0))
+                finally:
+                    receiver.cancel()
+        except Exception:
+            self.recorders["ws_connect"].error()
+        # Anything still pending never came back while we were connected.
+        for _ in self.pending:
+            self.recorders["ws_create"].error()
+        self.pending.clear()
+
+    async def run(self, pattern: str, deadline: float, games: int, create_interval: float):
+        if pattern == "steady":
+            await self.session(deadline, games, create_interval)
+        elif pattern == "idle":
+            await self.session(deadline, 0, create_interval)
+        elif pattern == "churn":
+            while time.perf_counter() < deadline:
+                await self.session(0, 1, create_interval)
+        else:
+            raise ValueError(f"Unknown client pattern: {pattern}")
+
+
+async def run_lobby_clients(base_ws_url: str, clients: int, pattern: str, duration: float,
+                            ramp_up: float, games: int, create_interval: float, recorders: dict,
+                            counters: dict):
+    """Ramps `clients` lobby clients up over `ramp_up` seconds and runs them for `duration` seconds."""
+    deadline = time.perf_counter() + duration
+    delay = ramp_up / clients if clients else 0
+
+    async def _start(i: int):
+        await asyncio.sleep(i * delay)
+        client = LobbyClient(base_ws_url, FIRST_SYNTHETIC_USER_ID + i, recorders, counters)
+        await client.run(pattern, deadline, games, create_interval)
+
+    await asyncio.gather(*[_start(i) for i in range(clients)])
+
+
+# --- Synthetic Telegram Updates ---
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}", "username": f"load{user_id}"}
+
+def _chat(user_id: int) -> dict:
+    return {"id": user_id, "type": "private", "first_name": f"Load{user_id}"}
+
+def build_update(update_id: int, user_id: int) -> dict:
+    """
+    Alternates between a /start command and a "wallet" menu tap. Both hit the database
+    and each produces exactly one WEBHOOK_REPLY_METHODS call, so processing can be counted.
+    """
+    now = int(time.time())
+    if update_id % 2 == 0:
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": now, "chat": _chat(user_id), "from": _user(user_id), "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}}
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": _user(user_id), "chat_instance": str(user_id), "data": "wallet",
+        "message": {"message_id": update_id, "date": now, "chat": _chat(user_id), "text": "menu"}}}
+
+
+async def run_webhook_sender(base_http_url: str, rate: float, duration: float, users: int,
+                             recorder: LatencyRecorder, max_in_flight: int = 1000):
+    """
+    Posts synthetic updates to /api/telegram/webhook at a fixed open-loop rate.
+    Latency is measured from each request's scheduled send time, so a slow server
+    shows up as latency instead of silently lowering the offered load.
+    """
+    url = f"{base_http_url}/api/telegram/webhook"
+    update_ids = itertools.count(1)
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def _send(scheduled_at: float):
+            update_id = next(update_ids)
+            payload = build_update(update_id, FIRST_SYNTHETIC_USER_ID + update_id % max(users, 1))
+            async with in_flight:
+                try:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
+                    recorder.record(time.perf_counter() - scheduled_at)
+                except httpx.HTTPError:
+                    recorder.error()
+
+        tasks = []
+        interval = 1 / rate
+        start = time.perf_counter()
+        for n in range(int(rate * duration)):
+            scheduled_at = start + n * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(_send(scheduled_at)))
+        await asyncio.gather(*tasks)
@@ -0,0 +1,145 @@
+# loadtest/metrics.py - Latency, throughput and memory bookkeeping for the harness
+
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+
+# --- Latency & Throughput ---
+class LatencyRecorder:
+    """Collects latency samples (in seconds) and error counts for one kind of operation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+        self.errors = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.finished_at = time.perf_counter()
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def error(self):
+        self.errors += 1
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile in milliseconds; 0.0 if nothing was recorded."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+        return ordered[rank] * 1000
+
+    def summary(self) -> dict:
+        elapsed = (self.finished_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        total = len(self.samples) + self.errors
+        return {
+            "count": len(self.samples),
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(max(self.samples) * 1000, 2) if self.samples else 0.0,
+            "throughput_per_sec": round(len(self.samples) / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+# --- Memory per Worker ---
+def _read_rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    return None
+
+def _child_pids(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return []
+
+
+class MemorySampler:
+    """
+    Periodically samples the RSS of the gunicorn master's worker processes.
+    Uses /proc, so it only reports numbers on Linux; elsewhere the report is empty.
+    """
+
+    def __init__(self, master_pid: int, interval: float = 0.5):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.workers: Dict[int, Dict[str, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self):
+        pids = _child_pids(self.master_pid) or [self.master_pid]
+        for pid in pids:
+            rss_kb = _read_rss_kb(pid)
+            if rss_kb is None:
+                continue
+            rss_mb = rss_kb / 1024
+            entry = self.workers.setdefault(pid, {"start_rss_mb": rss_mb, "peak_rss_mb": rss_mb, "last_rss_mb": rss_mb})
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], rss_mb)
+            entry["last_rss_mb"] = rss_mb
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.sample()
+
+    def summary(self) -> dict:
+        return {str(pid): {k: round(v, 1) for k, v in data.items()} for pid, data in self.workers.items()}
+
+
+# --- Regression Gate ---
+# A gate file is a flat JSON object of thresholds. Keys ending in "_max" fail the
+# run when the measured value is above them, keys ending in "_min" when below, e.g.
+#   {"ws_create.p99_ms_max": 250, "webhook.throughput_per_sec_min": 450,
+#    "memory.peak_rss_mb_max": 400, "webhook.error_rate_max": 0.01}
+def _lookup(report: dict, path: str) -> Optional[float]:
+    if path == "memory.peak_rss_mb":
+        peaks = [w["peak_rss_mb"] for w in report.get("memory", {}).values()]
+        return max(peaks) if peaks else None
+    node = report
+    for part in path.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+def check_gate(report: dict, gate: dict) -> List[str]:
+    """Returns a list of human-readable violations; an empty list means the gate passed."""
+    violations = []
+    for key, limit in gate.items():
+        path, _, bound = key.rpartition("_")
+        value = _lookup(report, path)
+        if bound not in ("min", "max") or value is None:
+            violations.append(f"{key}: no such metric in the report")
+        elif bound == "max" and value > limit:
+            violations.append(f"{path} = {value} exceeds {limit}")
+        elif bound == "min" and value < limit:
+            violations.append(f"{path} = {value} is below {limit}")
+    return violations
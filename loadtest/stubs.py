@@ -0,0 +1,114 @@
+# loadtest/stubs.py - Local stand-ins for the Telegram Bot API and Chapa
+
+import asyncio
+import itertools
+import time
+import uuid
+from urllib.parse import parse_qsl
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+# --- Shared Helpers ---
+STUB_BOT_ID = 100000001
+STUB_BOT_USERNAME = "yeab_loadtest_bot"
+
+async def _read_params(request: Request) -> dict:
+    """PTB sends url-encoded form data, other clients send JSON. Accept either."""
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            return await request.json()
+        except ValueError:
+            return {}
+    return dict(parse_qsl(body.decode(errors="replace")))
+
+def _ok(result) -> dict:
+    return {"ok": True, "result": result}
+
+
+# --- Telegram Bot API Stub ---
+def build_telegram_stub() -> FastAPI:
+    """
+    Answers the Bot API methods app.py and the handlers call.
+    Point the app at it with TELEGRAM_API_BASE_URL=http://host:port/bot
+    """
+    stub = FastAPI(title="Telegram Bot API Stub")
+    stub.state.webhook_url = ""
+    stub.state.calls = {}
+    message_ids = itertools.count(1)
+
+    def _message(params: dict) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        return {
+            "message_id": next(message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": STUB_BOT_ID, "is_bot": True, "first_name": "Yeab", "username": STUB_BOT_USERNAME},
+            "text": params.get("text", ""),
+        }
+
+    @stub.post("/bot{token}/{method}")
+    @stub.get("/bot{token}/{method}")
+    async def bot_method(token: str, method: str, request: Request):
+        params = await _read_params(request)
+        stub.state.calls[method] = stub.state.calls.get(method, 0) + 1
+
+        if method == "getMe":
+            return _ok({"id": STUB_BOT_ID, "is_bot": True, "first_name": "Yeab", "username": STUB_BOT_USERNAME,
+                        "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False})
+        if method == "getWebhookInfo":
+            return _ok({"url": stub.state.webhook_url, "has_custom_certificate": False, "pending_update_count": 0})
+        if method == "setWebhook":
+            stub.state.webhook_url = params.get("url", "")
+            return _ok(True)
+        if method == "deleteWebhook":
+            stub.state.webhook_url = ""
+            return _ok(True)
+        if method in ("sendMessage", "editMessageText"):
+            return _ok(_message(params))
+        # answerCallbackQuery, setMyCommands and anything else we don't model.
+        return _ok(True)
+
+    @stub.get("/stats")
+    async def stats():
+        return stub.state.calls
+
+    return stub
+
+
+# --- Chapa Stub ---
+def build_chapa_stub() -> FastAPI:
+    """
+    Answers Chapa's transaction initialize endpoint.
+    Point the app at it with CHAPA_API_BASE_URL=http://host:port/v1
+    """
+    stub = FastAPI(title="Chapa Stub")
+
+    @stub.post("/v1/transaction/initialize")
+    async def initialize(request: Request):
+        params = await _read_params(request)
+        tx_ref = params.get("tx_ref") or str(uuid.uuid4())
+        return {
+            "message": "Hosted Link",
+            "status": "success",
+            "data": {"checkout_url": f"http://{request.url.netloc}/checkout/{tx_ref}"},
+        }
+
+    @stub.get("/v1/transaction/verify/{tx_ref}")
+    async def verify(tx_ref: str):
+        return {"message": "Payment details", "status": "success", "data": {"tx_ref": tx_ref, "status": "success"}}
+
+    return stub
+
+
+# --- Running the Stubs In-Process ---
+async def serve_stub(stub: FastAPI, host: str, port: int) -> uvicorn.Server:
+    """Starts a stub on the current event loop and waits until it is accepting connections."""
+    server = uvicorn.Server(uvicorn.Config(stub, host=host, port=port, log_level="warning", access_log=False))
+    stub.state.serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if stub.state.serve_task.done():
+            stub.state.serve_task.result()  # Re-raise the bind error, if any.
+        await asyncio.sleep(0.05)
+    return server